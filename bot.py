@@ -2,9 +2,11 @@ import os
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
-import excel_work
 
+# Load the .env before importing excel_work, it reads its settings when imported
 load_dotenv()
+import excel_work
+
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
 
 intents = discord.Intents.default()  # no message_content needed for slash
@@ -62,12 +64,12 @@ async def expenses(interaction: discord.Interaction, month: str):
     print('Calling function to get expenses result')
     await interaction.response.defer()
     try:
-        result, value_1 = excel_work.main_function(month)
+        result, value_1 = await excel_work.main_function(month)
         print(result)
         if result > 0:
             await interaction.followup.send(f'<@{user1_id}> owes <@{user2_id}> {result}e')
         elif result < 0:
-            await interaction.followup.send(f'<@{user2_id}> owes <@{user1_id}> {result}e')
+            await interaction.followup.send(f'<@{user2_id}> owes <@{user1_id}> {abs(result)}e')
         elif result == 0:
             await interaction.followup.send("Somehow you both spent the same amount - " + str(value_1) + "e")
         else:
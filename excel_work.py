@@ -1,16 +1,113 @@
 import os
 import io
-from dotenv import load_dotenv
+import asyncio
+import datetime
+import hashlib
+import posixpath
+import threading
+import zipfile
+import xml.etree.ElementTree as ET
+from contextlib import contextmanager
+from types import MappingProxyType
 from googleapiclient.discovery import build
 from googleapiclient.http import MediaIoBaseDownload, MediaFileUpload
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from openpyxl import load_workbook, utils
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format, is_timedelta_format
+from openpyxl.utils.datetime import CALENDAR_MAC_1904, CALENDAR_WINDOWS_1900, from_excel, from_ISO8601
+
+# lxml can filter the row elements in C, the standard library parser is used when it isn't installed
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
+
+# Drive file and the sheet of each person, the .env file is loaded by bot.py before importing this module
+FILE_ID = os.getenv("FILE_ID")
+SHEET_1 = os.getenv("SHEET_1")
+SHEET_2 = os.getenv("SHEET_2")
+
+# Print every cell and download chunk, set DEBUG=1 in the .env file. Running with python -O removes them completely
+VERBOSE = os.getenv("DEBUG") == "1"
 
 # Scopes required for accessing Google Drive
 SCOPES = ['https://www.googleapis.com/auth/drive']
 
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# Bytes asked per download request, the default 100KB means one request for every 100KB of the file.
+# Can be changed with DOWNLOAD_CHUNK_SIZE in the .env file
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+DOWNLOAD_CHUNK_SIZE = DEFAULT_DOWNLOAD_CHUNK_SIZE
+if os.getenv("DOWNLOAD_CHUNK_SIZE"):
+    try:
+        DOWNLOAD_CHUNK_SIZE = int(os.getenv("DOWNLOAD_CHUNK_SIZE"))
+        if DOWNLOAD_CHUNK_SIZE <= 0:
+            raise ValueError("it has to be a positive number of bytes")
+    except ValueError as e:
+        print(f"Invalid DOWNLOAD_CHUNK_SIZE {os.getenv('DOWNLOAD_CHUNK_SIZE')!r}: {e}")
+        print(f"Using the default of {DEFAULT_DOWNLOAD_CHUNK_SIZE} bytes...")
+        DOWNLOAD_CHUNK_SIZE = DEFAULT_DOWNLOAD_CHUNK_SIZE
+
+# Bytes sent per resumable upload request, Drive needs this to be a multiple of 256KB
+UPLOAD_CHUNK_SIZE = 32 * 256 * 1024
+
+# Times a failed chunk is retried, with exponential backoff. Each chunk is its own ranged
+# request, so a retry continues from the bytes already transferred instead of starting over
+DRIVE_RETRIES = 5
+
+# Rows with the expenses of each person, months go from column C(3) to N(14)
+EXPENSE_ROWS = frozenset((16, 24, 39, 52))
+MONTH_ROW = 16
+FIRST_MONTH_COL = 3
+LAST_MONTH_COL = 14
+# Only these rows are ever read, and nothing after the last one or after LAST_COL
+READ_ROWS = EXPENSE_ROWS | {MONTH_ROW}
+LAST_ROW = max(READ_ROWS)
+LAST_COL = LAST_MONTH_COL
+
+# Get starting month/column, to transform month into corresponding number
+MONTH_TO_COL = MappingProxyType({
+    'jan': 3,
+    'fev': 4,
+    'feb': 4,
+    'mar': 5,
+    'abr': 6,
+    'apr': 6,
+    'mai': 7,
+    'may': 7,
+    'jun': 8,
+    'jul': 9,
+    'ago': 10,
+    'aug': 10,
+    'set': 11,
+    'sep': 11,
+    'out': 12,
+    'oct': 12,
+    'nov': 13,
+    'dez': 14,
+    'dec': 14
+})
+
+# Authenticated Drive service shared by every helper
+_SERVICE = None
+_SERVICE_LOCK = threading.Lock()
+
+# Refresh the token this long before it expires, so no Drive call has to wait for the refresh
+TOKEN_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+# Wait at least this long between background refreshes, in case a new token lives shorter than the margin
+TOKEN_REFRESH_MIN_DELAY = 60
+
+# Downloaded xlsx kept between calls, only downloaded again when the Drive file changes
+_XLSX_CACHE = {"rev": None, "data": None}
+_XLSX_CACHE_LOCK = threading.Lock()
+
+# Results of main_function by (revision, start column), cleared when a new revision is loaded.
+# Only used while holding _XLSX_CACHE_LOCK, get_cached_xlsx clears it from another thread
+_RESULTS_CACHE = {}
+
 
 def authenticate_google_drive():
     """
@@ -20,53 +117,94 @@ def authenticate_google_drive():
     Returns:
         googleapiclient.discovery.Resource: Authenticated Drive service
     """
-    creds = None
-
-    # Check if we have a token.json file (created after first auth)
-    if os.path.exists('token.json'):
-        try:
-            creds = Credentials.from_authorized_user_file('token.json', SCOPES)
-        except Exception as e:
-            print(f"Error loading token.json: {e}")
-            print("Will re-authenticate...")
-            creds = None
-
-    # If no valid credentials, authenticate
-    if not creds or not creds.valid:
-        if creds and creds.expired and creds.refresh_token:
+    global _SERVICE
+
+    # Building the service reads token.json and the discovery document, so do it once per process.
+    # The token is then kept fresh in the background by _schedule_token_refresh.
+    with _SERVICE_LOCK:
+        if _SERVICE is not None:
+            return _SERVICE
+
+        creds = None
+
+        # Check if we have a token.json file (created after first auth)
+        if os.path.exists('token.json'):
             try:
-                print("Token expired, refreshing...")
-                creds.refresh(Request())
-                print("Token refreshed successfully!")
+                creds = Credentials.from_authorized_user_file('token.json', SCOPES)
             except Exception as e:
-                print(f"Failed to refresh token: {e}")
-                print("Re-authenticating...")
+                print(f"Error loading token.json: {e}")
+                print("Will re-authenticate...")
                 creds = None
 
-        if not creds:
-            # Check if credentials.json exists
-            if not os.path.exists('credentials.json'):
-                raise FileNotFoundError(
-                    "credentials.json not found. Please:\n"
-                    "1. Download credentials.json from Google Cloud Console\n"
-                    "2. Place it in the same directory as this script"
-                )
-
-            # Authenticate using credentials.json
-            print("Opening browser for authentication...")
-            flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
-            creds = flow.run_local_server(port=0)
-            print("Authentication successful!")
-
-            # Save credentials for next run
-            with open('token.json', 'w') as token:
-                token.write(creds.to_json())
-            print("Credentials saved to token.json")
+        # If no valid credentials, authenticate
+        if not creds or not creds.valid:
+            if creds and creds.expired and creds.refresh_token:
+                try:
+                    print("Token expired, refreshing...")
+                    creds.refresh(Request())
+                    print("Token refreshed successfully!")
+                except Exception as e:
+                    print(f"Failed to refresh token: {e}")
+                    print("Re-authenticating...")
+                    creds = None
+
+            if not creds:
+                # Check if credentials.json exists
+                if not os.path.exists('credentials.json'):
+                    raise FileNotFoundError(
+                        "credentials.json not found. Please:\n"
+                        "1. Download credentials.json from Google Cloud Console\n"
+                        "2. Place it in the same directory as this script"
+                    )
+
+                # Authenticate using credentials.json
+                print("Opening browser for authentication...")
+                flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
+                creds = flow.run_local_server(port=0)
+                print("Authentication successful!")
+
+                # Save credentials for next run
+                with open('token.json', 'w') as token:
+                    token.write(creds.to_json())
+                print("Credentials saved to token.json")
+
+        _schedule_token_refresh(creds)
+
+        # Use the discovery document bundled with googleapiclient instead of fetching it,
+        # which also means there is no file cache to warn about
+        _SERVICE = build('drive', 'v3', credentials=creds, static_discovery=True, cache_discovery=False)
+        return _SERVICE
+
+
+def _schedule_token_refresh(creds, min_delay=0):
+    # Refresh the credentials in a background thread TOKEN_REFRESH_MARGIN before they expire
+    if not creds.refresh_token or creds.expiry is None:
+        return
+
+    # google-auth keeps the expiry as a naive UTC datetime
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    delay = max((creds.expiry - TOKEN_REFRESH_MARGIN - now).total_seconds(), min_delay)
+
+    timer = threading.Timer(delay, _refresh_token, args=(creds,))
+    timer.daemon = True
+    timer.start()
+
+
+def _refresh_token(creds):
+    try:
+        creds.refresh(Request())
+        with open('token.json', 'w') as token:
+            token.write(creds.to_json())
+        print("Token refreshed in the background")
+    except Exception as e:
+        # Nothing else to do here, the next Drive call refreshes the token itself
+        print(f"Failed to refresh token in the background: {e}")
+        return
 
-    return build('drive', 'v3', credentials=creds)
+    _schedule_token_refresh(creds, min_delay=TOKEN_REFRESH_MIN_DELAY)
 
 
-def download_file_by_id(file_id, destination_path, service=None):
+def download_file_by_id(file_id, destination_path, service=None, file_name=None):
     """
     Download a file from Google Drive by its file ID.
 
@@ -74,44 +212,89 @@ def download_file_by_id(file_id, destination_path, service=None):
         file_id (str): Google Drive file ID
         destination_path (str): Local path where file will be saved
         service: Optional pre-authenticated Drive service object
+        file_name (str): Optional file name, skips the metadata request when given
 
     Returns:
         bool: True if successful, False otherwise
     """
+    part_path = None
     try:
         if service is None:
             service = authenticate_google_drive()
 
-        # Get file metadata
-        file_metadata = service.files().get(fileId=file_id).execute()
-        file_name = file_metadata.get('name', 'unknown_file')
+        # Get file metadata, only needed when the caller doesn't already know the name
+        if file_name is None:
+            file_metadata = service.files().get(fileId=file_id, fields='name').execute()
+            file_name = file_metadata.get('name', 'unknown_file')
 
         print(f"Downloading: {file_name}")
 
         # Request file content
         request = service.files().get_media(fileId=file_id)
 
-        # Create file stream
-        fh = io.BytesIO()
-        downloader = MediaIoBaseDownload(fh, request)
-
-        done = False
-        while done is False:
-            status, done = downloader.next_chunk()
-            print(f"Download progress: {int(status.progress() * 100)}%")
-
-        # Write to file
-        with open(destination_path, 'wb') as f:
-            f.write(fh.getvalue())
-
+        # Write the chunks straight to a temporary file as they arrive instead of keeping the whole file
+        # in memory, it only replaces the destination once the download finished so a failed download
+        # doesn't leave a broken file behind
+        part_path = destination_path + '.part'
+        with open(part_path, 'wb') as fh:
+            downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+
+            # Only print when the progress moved at least 5%, not on every chunk
+            last_progress = -5
+            done = False
+            while done is False:
+                status, done = downloader.next_chunk(num_retries=DRIVE_RETRIES)
+                progress = int(status.progress() * 100)
+                if __debug__ and VERBOSE and (progress - last_progress >= 5 or done):
+                    print(f"Download progress: {progress}%")
+                    last_progress = progress
+
+        os.replace(part_path, destination_path)
         print(f"File downloaded successfully to: {destination_path}")
         return True
 
     except Exception as e:
         print(f"Error downloading file: {str(e)}")
+        if part_path is not None and os.path.exists(part_path):
+            os.remove(part_path)
         return False
 
 
+def download_to_memory(file_id, service=None):
+    """
+    Download a file from Google Drive into memory, without touching the disk.
+
+    Args:
+        file_id (str): Google Drive file ID
+        service: Optional pre-authenticated Drive service object
+
+    Returns:
+        io.BytesIO: File content, positioned at the start
+    """
+    if service is None:
+        service = authenticate_google_drive()
+
+    request = service.files().get_media(fileId=file_id)
+
+    fh = io.BytesIO()
+    downloader = MediaIoBaseDownload(fh, request, chunksize=DOWNLOAD_CHUNK_SIZE)
+
+    done = False
+    while done is False:
+        _, done = downloader.next_chunk(num_retries=DRIVE_RETRIES)
+
+    fh.seek(0)
+    return fh
+
+
+def _file_md5(file_path):
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            md5.update(block)
+    return md5.hexdigest()
+
+
 def get_file_for_editing(file_id, local_filename=None, service=None):
     """
     Download a file from Google Drive for local editing.
@@ -129,7 +312,7 @@ def get_file_for_editing(file_id, local_filename=None, service=None):
             service = authenticate_google_drive()
 
         # Get file metadata first
-        file_metadata = service.files().get(fileId=file_id).execute()
+        file_metadata = service.files().get(fileId=file_id, fields='name,md5Checksum').execute()
         original_name = file_metadata.get('name', f'file_{file_id}')
 
         # Use provided filename or original name
@@ -138,8 +321,15 @@ def get_file_for_editing(file_id, local_filename=None, service=None):
 
         print(f"Getting file: {original_name}")
 
+        # Skip the download when the local copy is already the same as the file on Drive
+        # (native Google files have no md5Checksum, those are always downloaded)
+        remote_md5 = file_metadata.get('md5Checksum')
+        if remote_md5 and os.path.exists(local_filename) and _file_md5(local_filename) == remote_md5:
+            print(f"Local file is up to date, ready for editing: {local_filename}")
+            return local_filename
+
         # Download the file
-        success = download_file_by_id(file_id, local_filename, service)
+        success = download_file_by_id(file_id, local_filename, service, file_name=original_name)
 
         if success:
             print(f"File ready for editing: {local_filename}")
@@ -180,7 +370,7 @@ def save_file_back_to_drive(file_id, local_filename, service=None):
         return False
 
 
-def update_file_content(file_id, new_file_path, service=None):
+def update_file_content(file_id, new_file_path, service=None, mimetype=XLSX_MIMETYPE):
     """
     Update the content of an existing file in Google Drive.
 
@@ -188,6 +378,7 @@ def update_file_content(file_id, new_file_path, service=None):
         file_id (str): Google Drive file ID to update
         new_file_path (str): Local path to the new content
         service: Optional pre-authenticated Drive service object
+        mimetype (str): Mimetype of the new content (defaults to xlsx)
 
     Returns:
         bool: True if successful, False otherwise
@@ -196,11 +387,21 @@ def update_file_content(file_id, new_file_path, service=None):
         if service is None:
             service = authenticate_google_drive()
 
-        media = MediaFileUpload(new_file_path)
-        updated_file = service.files().update(
+        # Resumable upload in chunks, a dropped connection only resends the current chunk
+        media = MediaFileUpload(
+            new_file_path,
+            mimetype=mimetype,
+            resumable=True,
+            chunksize=UPLOAD_CHUNK_SIZE
+        )
+        request = service.files().update(
             fileId=file_id,
             media_body=media
-        ).execute()
+        )
+
+        updated_file = None
+        while updated_file is None:
+            _, updated_file = request.next_chunk(num_retries=DRIVE_RETRIES)
 
         print(f"File content updated successfully. File ID: {updated_file.get('id')}")
         return True
@@ -239,126 +440,343 @@ def edit_file_workflow(file_id, service=None):
         return None
 
 
-def read_cells(file_path: str, sheet_name: str, start_col: int, last_column: int):
-    wb = load_workbook(file_path, data_only=True)
-    sheet = wb[sheet_name]
+def get_cached_xlsx(file_id, service=None):
+    """
+    Return the xlsx bytes of a Drive file, downloading them only when
+    the file changed on Drive since the last call.
+
+    Args:
+        file_id (str): Google Drive file ID
+        service: Optional pre-authenticated Drive service object
 
-    # From C to N line 16, 24, 50, 39
-    row_number = [16, 24, 39, 52]
-    total = 0
+    Returns:
+        tuple: Drive revision of the file and the bytes of the xlsx file
+    """
+    if service is None:
+        service = authenticate_google_drive()
 
-    # Create for loop to go through the column letters and add all the values
-    for col in range(start_col, last_column):
-        for row in row_number:
-            cell_value = sheet.cell(row=row, column=col).value
-            if cell_value:
-                print(f"Row/Col: {row}-{col} and cell value: {cell_value}")
-                total += cell_value
+    with _XLSX_CACHE_LOCK:
+        file_metadata = service.files().get(fileId=file_id, fields="headRevisionId,modifiedTime").execute()
+        # Native Google files have no headRevisionId, modifiedTime still tells us if it changed
+        rev = file_metadata.get("headRevisionId") or file_metadata.get("modifiedTime")
+
+        if _XLSX_CACHE["data"] is not None and _XLSX_CACHE["rev"] == rev:
+            print(f"Using cached xlsx (revision {rev})")
+            return rev, _XLSX_CACHE["data"]
+
+        _XLSX_CACHE.update(rev=None, data=None)
+        _RESULTS_CACHE.clear()
+
+        # Only reading here, so keep it in memory instead of going through a local file
+        print(f"Downloading revision {rev}")
+        fh = download_to_memory(file_id, service)
+
+        # Keep the raw xlsx, read_sheet only parses the parts of it that are needed
+        xlsx_bytes = fh.getvalue()
+        _XLSX_CACHE.update(rev=rev, data=xlsx_bytes)
+        return rev, xlsx_bytes
+
+
+def _local_name(tag: str):
+    # Drop the XML namespace, "{http://...}row" -> "row"
+    return tag.rpartition('}')[2]
+
+
+def _column_number(cell_ref: str):
+    # "C16" -> 3
+    col = 0
+    for char in cell_ref:
+        if not char.isalpha():
+            break
+        col = col * 26 + ord(char.upper()) - ord('A') + 1
+    return col
+
+
+def _find_sheet_part(zf, sheet_name: str):
+    # workbook.xml maps the sheet name to a relationship id, and its .rels file maps that id to the sheet XML
+    rel_id = None
+    for sheet in ET.fromstring(zf.read('xl/workbook.xml')).iter():
+        if _local_name(sheet.tag) == 'sheet' and sheet.get('name') == sheet_name:
+            rel_id = next(value for key, value in sheet.attrib.items() if _local_name(key) == 'id')
+            break
+    if rel_id is None:
+        raise KeyError(f"Worksheet {sheet_name} does not exist.")
+
+    for rel in ET.fromstring(zf.read('xl/_rels/workbook.xml.rels')):
+        if rel.get('Id') == rel_id:
+            target = rel.get('Target')
+            if target.startswith('/'):
+                return target.lstrip('/')
+            return posixpath.normpath(posixpath.join('xl', target))
+    raise KeyError(f"Worksheet {sheet_name} has no XML part.")
+
+
+def _read_shared_strings(zf):
+    if 'xl/sharedStrings.xml' not in zf.namelist():
+        return []
+    strings = []
+    for si in ET.fromstring(zf.read('xl/sharedStrings.xml')):
+        strings.append(''.join(t.text or '' for t in si.iter() if _local_name(t.tag) == 't'))
+    return strings
+
+
+def _read_date_styles(zf):
+    # Dates are numbers with a date number format, find which cell styles (the "s" attribute) have one
+    epoch = CALENDAR_WINDOWS_1900
+    for elem in ET.fromstring(zf.read('xl/workbook.xml')):
+        if _local_name(elem.tag) == 'workbookPr' and elem.get('date1904') in ('1', 'true'):
+            epoch = CALENDAR_MAC_1904
+
+    date_styles = {}
+    if 'xl/styles.xml' not in zf.namelist():
+        return date_styles, epoch
+
+    styles = ET.fromstring(zf.read('xl/styles.xml'))
+    num_formats = dict(BUILTIN_FORMATS)
+    for elem in styles:
+        if _local_name(elem.tag) == 'numFmts':
+            for num_format in elem:
+                num_formats[int(num_format.get('numFmtId'))] = num_format.get('formatCode')
+
+    for elem in styles:
+        if _local_name(elem.tag) == 'cellXfs':
+            for style_id, xf in enumerate(elem):
+                num_format = num_formats.get(int(xf.get('numFmtId', 0)))
+                if num_format and is_date_format(num_format):
+                    date_styles[style_id] = 'timedelta' if is_timedelta_format(num_format) else 'date'
+    return date_styles, epoch
+
+
+def _cell_value(cell, get_shared_strings, get_date_styles):
+    # Values as openpyxl gives them with data_only, formulas give their last calculated value
+    cell_type = cell.get('t', 'n')
+    value = None
+    for child in cell:
+        name = _local_name(child.tag)
+        if name == 'v':
+            value = child.text
+        elif name == 'is':
+            value = ''.join(t.text or '' for t in child.iter() if _local_name(t.tag) == 't')
+
+    if value is None:
+        return None
+    if cell_type == 'n':
+        number = float(value)
+        number = int(number) if number.is_integer() and '.' not in value and 'E' not in value.upper() else number
+        # Only look at the styles for cells that have one, plain numbers don't need them
+        style_id = int(cell.get('s', 0))
+        if style_id:
+            date_styles, epoch = get_date_styles()
+            if style_id in date_styles:
+                return from_excel(number, epoch, timedelta=date_styles[style_id] == 'timedelta')
+        return number
+    if cell_type == 'd':
+        return from_ISO8601(value)
+    if cell_type == 's':
+        return get_shared_strings()[int(value)]
+    if cell_type == 'b':
+        return value == '1'
+    return value
+
+
+def read_sheet(zf, sheet_name: str):
+    """
+    Read the values of the READ_ROWS rows of a sheet, up to column LAST_COL.
+
+    Args:
+        zf (zipfile.ZipFile): Opened xlsx file, can be shared between threads reading other sheets
+        sheet_name (str): Name of the sheet to read
+
+    Returns:
+        list: Rows of the sheet starting at A1, so cell (row, col) is rows[row - 1][col - 1].
+              Rows outside READ_ROWS are left empty.
+    """
+    rows = [[None] * LAST_COL for _ in range(LAST_ROW)]
+    shared_strings = None
+    date_styles = None
+
+    part = _find_sheet_part(zf, sheet_name)
+
+    # Only load the shared strings when a text cell is actually in the rows we read
+    def get_shared_strings():
+        nonlocal shared_strings
+        if shared_strings is None:
+            shared_strings = _read_shared_strings(zf)
+        return shared_strings
+
+    # Same for the styles, only needed when a number cell has a style that could be a date
+    def get_date_styles():
+        nonlocal date_styles
+        if date_styles is None:
+            date_styles = _read_date_styles(zf)
+        return date_styles
+
+    # Stream the sheet XML and stop after the last row we need, the rest of the sheet is never parsed
+    with zf.open(part) as sheet_xml:
+        if lxml_etree is not None:
+            rows_xml = lxml_etree.iterparse(sheet_xml, tag='{*}row')
+        else:
+            rows_xml = ET.iterparse(sheet_xml)
+
+        row = 0
+        for _, elem in rows_xml:
+            if _local_name(elem.tag) != 'row':
+                continue
+
+            row = int(elem.get('r', row + 1))
+            if row > LAST_ROW:
+                break
+            if row not in READ_ROWS:
+                elem.clear()
+                continue
+
+            col = 0
+            for cell in elem:
+                if _local_name(cell.tag) != 'c':
+                    continue
+                col = _column_number(cell.get('r', '')) or col + 1
+                if col <= LAST_COL:
+                    rows[row - 1][col - 1] = _cell_value(cell, get_shared_strings, get_date_styles)
+            elem.clear()
+
+    return rows
+
+
+def read_cells(rows, start_col: int, last_column: int):
+    # Keep the numbers of the rows we care about by (row, col), text like notes or
+    # error values in a cell isn't an expense (and bool is an int, so leave it out too)
+    cells = {}
+    if last_column > start_col:
+        for row in sorted(EXPENSE_ROWS):
+            for col, cell_value in enumerate(rows[row - 1][start_col - 1:last_column - 1], start=start_col):
+                if isinstance(cell_value, (int, float)) and not isinstance(cell_value, bool):
+                    cells[(row, col)] = cell_value
+
+    if __debug__ and VERBOSE:
+        for (row, col), cell_value in cells.items():
+            print(f"Row/Col: {row}-{col} and cell value: {cell_value}")
+
+    total = sum(cells.values())
 
     print(f'total: {total}')
-    wb.close()
     return total
 
 
-# def write_cell(file_path:str, sheet_name: str, cell: str, value):
-#     #TODO Get the value to write and write
-#     wb = load_workbook("file_path")
-#     sheet = wb[""]
+@contextmanager
+def open_workbook_for_write(file_path: str):
+    """
+    Open a workbook for editing and save it once when the block ends.
 
-#     sheet[cell] = value  # write value into the cell
+    Args:
+        file_path (str): Path to the local xlsx file
 
-#     wb.save(FILE_PATH)
-#     wb.close()
+    Yields:
+        openpyxl.Workbook: Workbook to edit
+    """
+    # No read_only here, read_only workbooks can't be saved
+    wb = load_workbook(file_path)
+    try:
+        yield wb
+        wb.save(file_path)
+    finally:
+        wb.close()
 
 
-def get_last_month(file_path: str, sheet_name: str):
-    wb = load_workbook(file_path, data_only=True)
-    sheet = wb[sheet_name]
+def write_cells(file_path: str, updates):
+    """
+    Write several values with a single load and save of the workbook.
 
-    # Loop through columns C(3) to N(14)
-    row_number = 16
-    for col in range(3, 15):  # Start from C
-        cell_value = sheet.cell(row=row_number, column=col).value
+    Args:
+        file_path (str): Path to the local xlsx file
+        updates: Iterable of (sheet_name, cell, value), e.g. ("Sheet1", "C60", "paid")
+    """
+    with open_workbook_for_write(file_path) as wb:
+        for sheet_name, cell, value in updates:
+            wb[sheet_name][cell] = value  # write value into the cell
+
+
+def write_cell(file_path: str, sheet_name: str, cell: str, value):
+    write_cells(file_path, [(sheet_name, cell, value)])
 
+
+def get_last_month(rows):
+    # Loop through columns C(3) to N(14)
+    values = rows[MONTH_ROW - 1][FIRST_MONTH_COL - 1:LAST_MONTH_COL]
+    for col, cell_value in enumerate(values, start=FIRST_MONTH_COL):  # Start from C
         if cell_value is None or str(cell_value).strip() == "0":
             break  # Stop at first empty column
 
         # This right now is useless because i want the number of the column and not the letter
         # last_column = utils.get_column_letter(col)
-        # print(f"{last_column}{row_number}: {cell_value}")
+        # print(f"{last_column}{MONTH_ROW}: {cell_value}")
 
     return col
 
 
-def main_function(month):
-    load_dotenv()
-    file_id = os.getenv("FILE_ID")
-    sheet_1 = os.getenv("SHEET_1")
-    sheet_2 = os.getenv("SHEET_2")
-
-    # Get starting month/column, to transform month into corresponding number
-    month_to_col = {
-        'jan': 3,
-        'fev': 4,
-        'feb': 4,
-        'mar': 5,
-        'abr': 6,
-        'apr': 6,
-        'mai': 7,
-        'may': 7,
-        'jun': 8,
-        'jul': 9,
-        'ago': 10,
-        'aug': 10,
-        'set': 11,
-        'sep': 11,
-        'out': 12,
-        'oct': 12,
-        'nov': 13,
-        'dez': 14,
-        'dec': 14
-    }
-
-    # Get file
-    local_file = edit_file_workflow(file_id)
-    print(local_file)
+def _get_cached_result(rev, start_col):
+    # The lock can be held for a whole download, so this runs in a thread and not on the event loop
+    with _XLSX_CACHE_LOCK:
+        return _RESULTS_CACHE.get((rev, start_col))
 
-    # Check last month with data to get the end month of calculations
-    last_month = get_last_month(local_file, sheet_1)
-    # print(last_month)
 
+def _store_result(rev, start_col, result):
+    with _XLSX_CACHE_LOCK:
+        # A newer revision may have been loaded while calculating, don't keep results of the old one
+        if _XLSX_CACHE["rev"] == rev:
+            _RESULTS_CACHE[(rev, start_col)] = result
+
+
+async def main_function(month):
     # Get input of month to start from user, call functions to get the values, calcualte them and print result
     #TODO change the input from this function to discord command
-    try:
-        user_month = month.lower().strip()
-        start_col = month_to_col.get(user_month)
+    # Check the month before anything else so a typo doesn't cost a Drive round-trip
+    user_month = month.lower().strip()
+    start_col = MONTH_TO_COL.get(user_month)
 
-        if start_col is None:
-            error_message = f"Invalid month: {user_month}. Valid options: {', '.join(month_to_col.keys())}"
-            print(error_message)
-            return error_message
-    except Exception as e:
-        error_message = "Invalid month with error:" + str(e)
+    if start_col is None:
+        error_message = f"Invalid month: {user_month}. Valid options: {', '.join(MONTH_TO_COL.keys())}"
         print(error_message)
-        return error_message
-    else:
-        print(f'Valid month {user_month}!')
+        raise ValueError(error_message)
+    print(f'Valid month {user_month}!')
+
+    # Get file, the Drive calls block so run them outside of the bot's event loop
+    service = await asyncio.to_thread(authenticate_google_drive)
+    rev, xlsx_bytes = await asyncio.to_thread(get_cached_xlsx, FILE_ID, service)
+
+    # Same file and same starting month always give the same result
+    cached = await asyncio.to_thread(_get_cached_result, rev, start_col)
+    if cached is not None:
+        print(f'Using cached result for {user_month} (revision {rev})')
+        return cached
+
+    # Parse both persons' sheets, they don't depend on each other so do it in parallel.
+    # Both share one ZipFile so the zip directory is only read once
+    with zipfile.ZipFile(io.BytesIO(xlsx_bytes)) as zf:
+        rows_1, rows_2 = await asyncio.gather(
+            asyncio.to_thread(read_sheet, zf, SHEET_1),
+            asyncio.to_thread(read_sheet, zf, SHEET_2),
+        )
+
+    # Check last month with data to get the end month of calculations
+    last_month = get_last_month(rows_1)
+    # print(last_month)
 
     try:
         # Get the values from the first person
-        value_1 = read_cells(local_file, sheet_1, start_col, last_month)
+        value_1 = read_cells(rows_1, start_col, last_month)
         print(value_1)
 
         # Get the values from the second person
-        value_2 = read_cells(local_file, sheet_2, start_col, last_month)
+        value_2 = read_cells(rows_2, start_col, last_month)
         print(value_2)
 
         # Calculate who spent more and how much owes the other person
         final_value = round(value_1 - value_2, 2)
         print(f'Final value: {final_value}')
+        await asyncio.to_thread(_store_result, rev, start_col, (final_value, value_1))
         return final_value, value_1
 
     except Exception as e:
         error_message = "Error while processing the calculations:" + str(e)
         print(error_message)
-        return error_message
+        raise RuntimeError(error_message) from e